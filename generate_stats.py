@@ -4,177 +4,107 @@ Generate additional statistics for UPC Citation Tracker
 """
 
 import sqlite3
-import json
+import sys
 from datetime import datetime
-from collections import Counter
 import re
 
-def generate_statistics(db_path="upc_decisions.db"):
-    """Generate comprehensive statistics from the database"""
-    
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Basic statistics
-        cursor.execute("SELECT COUNT(*) FROM UPC_decisions")
-        total_decisions = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM UPC_decisions WHERE decision_reference != ''")
-        decisions_with_ref = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM UPC_decisions WHERE number_citations > 0")
-        cited_decisions = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT SUM(number_citations) FROM UPC_decisions")
-        total_citations = cursor.fetchone()[0] or 0
-        
-        # Court statistics
-        cursor.execute("SELECT court, COUNT(*) FROM UPC_decisions GROUP BY court ORDER BY COUNT(*) DESC")
-        court_stats = cursor.fetchall()
-        
-        # Action type statistics
-        cursor.execute("SELECT type_of_action, COUNT(*) FROM UPC_decisions GROUP BY type_of_action ORDER BY COUNT(*) DESC")
-        action_stats = cursor.fetchall()
-        
-        # Monthly statistics
-        cursor.execute("""
-            SELECT substr(date, 1, 7) as month, COUNT(*) 
-            FROM UPC_decisions 
-            WHERE date != '' 
-            GROUP BY substr(date, 1, 7) 
-            ORDER BY month DESC 
-            LIMIT 12
-        """)
-        monthly_stats = cursor.fetchall()
-        
-        # Top cited decisions
-        cursor.execute("""
-            SELECT decision_reference, number_citations, parties, court
-            FROM UPC_decisions 
-            WHERE number_citations > 0 
-            ORDER BY number_citations DESC 
-            LIMIT 20
-        """)
-        top_cited = cursor.fetchall()
-        
-        # Most active parties (simplified)
-        cursor.execute("SELECT parties FROM UPC_decisions WHERE parties != ''")
-        all_parties = cursor.fetchall()
-        
-        # Extract company names (simplified approach)
-        party_counts = Counter()
-        for (parties,) in all_parties:
-            # Split by "v." and clean up
-            if " v. " in parties:
-                parts = parties.split(" v. ")
-                for part in parts:
-                    clean_part = part.strip()
-                    if len(clean_part) > 5:  # Filter out very short names
-                        party_counts[clean_part] += 1
-        
-        most_active_parties = party_counts.most_common(10)
-        
-        conn.close()
-        
-        # Generate HTML statistics page
-        html_content = f"""<!DOCTYPE html>
+STATS_HTML_HEAD = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>UPC Citation Tracker - Statistics</title>
     <style>
-        body {{
+        body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
             margin: 0;
             padding: 0;
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             min-height: 100vh;
-        }}
-        .container {{
+        }
+        .container {
             max-width: 1200px;
             margin: 0 auto;
             padding: 20px;
-        }}
-        .card {{
+        }
+        .card {
             background: white;
             border-radius: 15px;
             box-shadow: 0 20px 40px rgba(0,0,0,0.1);
             overflow: hidden;
             margin-bottom: 20px;
-        }}
-        .header {{
+        }
+        .header {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
             padding: 40px 30px;
             text-align: center;
-        }}
-        .header h1 {{
+        }
+        .header h1 {
             margin: 0;
             font-size: 3em;
             font-weight: 700;
-        }}
-        .section {{
+        }
+        .section {
             padding: 30px;
-        }}
-        .section h2 {{
+        }
+        .section h2 {
             color: #333;
             border-bottom: 3px solid #667eea;
             padding-bottom: 10px;
             margin-bottom: 20px;
-        }}
-        .stats-grid {{
+        }
+        .stats-grid {
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
             gap: 20px;
             margin-bottom: 30px;
-        }}
-        .stat-card {{
+        }
+        .stat-card {
             background: linear-gradient(135deg, #f8f9fa, #e9ecef);
             padding: 20px;
             border-radius: 10px;
             text-align: center;
             border-left: 5px solid #667eea;
-        }}
-        .stat-number {{
+        }
+        .stat-number {
             font-size: 2.5em;
             font-weight: bold;
             color: #667eea;
             display: block;
-        }}
-        .stat-label {{
+        }
+        .stat-label {
             color: #666;
             font-size: 0.9em;
             text-transform: uppercase;
             letter-spacing: 1px;
-        }}
-        .chart-container {{
+        }
+        .chart-container {
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(400px, 1fr));
             gap: 30px;
             margin: 30px 0;
-        }}
-        .chart {{
+        }
+        .chart {
             background: #f8f9fa;
             padding: 20px;
             border-radius: 10px;
-        }}
-        .chart h3 {{
+        }
+        .chart h3 {
             margin-top: 0;
             color: #333;
-        }}
-        .bar {{
+        }
+        .bar {
             display: flex;
             align-items: center;
             margin-bottom: 10px;
-        }}
-        .bar-label {{
+        }
+        .bar-label {
             min-width: 200px;
             font-size: 0.9em;
             color: #666;
-        }}
-        .bar-fill {{
+        }
+        .bar-fill {
             background: linear-gradient(90deg, #667eea, #764ba2);
             height: 20px;
             border-radius: 10px;
@@ -186,47 +116,162 @@ def generate_statistics(db_path="upc_decisions.db"):
             color: white;
             font-size: 0.8em;
             font-weight: bold;
-        }}
-        .top-cited {{
+        }
+        .top-cited {
             overflow-x: auto;
-        }}
-        .top-cited table {{
+        }
+        .top-cited table {
             width: 100%;
             border-collapse: collapse;
-        }}
-        .top-cited th, .top-cited td {{
+        }
+        .top-cited th, .top-cited td {
             padding: 12px;
             text-align: left;
             border-bottom: 1px solid #e9ecef;
-        }}
-        .top-cited th {{
+        }
+        .top-cited th {
             background: #f8f9fa;
             font-weight: 600;
-        }}
-        .citation-badge {{
+        }
+        .citation-badge {
             background: #667eea;
             color: white;
             padding: 4px 8px;
             border-radius: 12px;
             font-size: 0.8em;
             font-weight: bold;
-        }}
-        .updated {{
+        }
+        .updated {
             text-align: center;
             padding: 20px;
             background: #e3f2fd;
             color: #1565c0;
             font-weight: 500;
-        }}
-        @media (max-width: 768px) {{
-            .container {{ padding: 10px; }}
-            .header h1 {{ font-size: 2em; }}
-            .stats-grid {{ grid-template-columns: 1fr; }}
-            .chart-container {{ grid-template-columns: 1fr; }}
-        }}
+        }
+        @media (max-width: 768px) {
+            .container { padding: 10px; }
+            .header h1 { font-size: 2em; }
+            .stats-grid { grid-template-columns: 1fr; }
+            .chart-container { grid-template-columns: 1fr; }
+        }
     </style>
 </head>
-<body>
+<body>"""
+
+STATS_BAR_TEMPLATE = """
+                        <div class="bar">
+                            <div class="bar-label">{label}</div>
+                            <div class="bar-fill" style="width: {percentage}%;">{count}</div>
+                        </div>"""
+
+STATS_HTML_FOOT = """
+                    </div>
+                </div>
+            </div>
+        </div>
+        
+        <div style="text-align: center; padding: 20px; color: rgba(255,255,255,0.8);">
+            <p>📊 Comprehensive UPC decision analysis • 🔄 Updated daily</p>
+        </div>
+    </div>
+</body>
+</html>"""
+
+def generate_statistics(db_path="upc_decisions.db", emit_json=False):
+    """Generate comprehensive statistics from the database (JSON file only if emit_json)"""
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        # Indexes for the ORDER BY / GROUP BY queries below
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_citations ON UPC_decisions(number_citations DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_court ON UPC_decisions(court)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_action ON UPC_decisions(type_of_action)")
+        conn.commit()
+
+        # Read-only from here on: larger page cache, mmap I/O, one read transaction
+        cursor.executescript("""
+            PRAGMA query_only = 1;
+            PRAGMA cache_size = -65536;
+            PRAGMA temp_store = MEMORY;
+            PRAGMA mmap_size = 268435456;
+        """)
+        cursor.execute("BEGIN")
+
+        # Basic statistics (single table scan)
+        cursor.execute("""
+            SELECT COUNT(*),
+                   COALESCE(SUM(CASE WHEN decision_reference != '' THEN 1 ELSE 0 END), 0),
+                   COALESCE(SUM(CASE WHEN number_citations > 0 THEN 1 ELSE 0 END), 0),
+                   COALESCE(SUM(number_citations), 0)
+            FROM UPC_decisions
+        """)
+        total_decisions, decisions_with_ref, cited_decisions, total_citations = cursor.fetchone()
+        
+        # Court and action type statistics
+        cursor.execute("""
+            SELECT 'court' AS kind, court AS label, COUNT(*) AS n
+            FROM UPC_decisions
+            GROUP BY court
+            UNION ALL
+            SELECT 'action', type_of_action, COUNT(*)
+            FROM UPC_decisions
+            GROUP BY type_of_action
+            ORDER BY kind, n DESC
+        """)
+        court_stats = []
+        action_stats = []
+        for kind, label, count in cursor:
+            (court_stats if kind == 'court' else action_stats).append((label, count))
+        
+        # Monthly statistics
+        cursor.execute("""
+            SELECT substr(date, 1, 7) as month, COUNT(*) 
+            FROM UPC_decisions 
+            WHERE date != '' 
+            GROUP BY substr(date, 1, 7) 
+            ORDER BY month DESC 
+            LIMIT 12
+        """)
+        monthly_stats = cursor.fetchall()
+        
+        # Top cited decisions
+        cursor.execute("""
+            SELECT decision_reference, number_citations, parties, court
+            FROM UPC_decisions 
+            WHERE number_citations > 0 
+            ORDER BY number_citations DESC 
+            LIMIT 20
+        """)
+        top_cited = cursor.fetchall()
+        
+        # Most active parties (simplified): split "A v. B" into one row per party in SQL
+        cursor.execute("""
+            WITH RECURSIVE split(party, rest) AS (
+                SELECT '', parties || ' v. '
+                FROM UPC_decisions
+                WHERE instr(parties, ' v. ') > 0
+                UNION ALL
+                SELECT substr(rest, 1, instr(rest, ' v. ') - 1),
+                       substr(rest, instr(rest, ' v. ') + 4)
+                FROM split
+                WHERE rest != ''
+            )
+            SELECT trim(party), COUNT(*)
+            FROM split
+            WHERE length(trim(party)) > 5
+            GROUP BY trim(party)
+            ORDER BY COUNT(*) DESC, trim(party)
+            LIMIT 10
+        """)
+        most_active_parties = cursor.fetchall()
+        
+        conn.commit()
+        conn.close()
+        
+        # Generate HTML statistics page
+        html_parts = [STATS_HTML_HEAD, f"""
     <div class="container">
         <div class="card">
             <div class="header">
@@ -263,37 +308,37 @@ def generate_statistics(db_path="upc_decisions.db"):
             <div class="section">
                 <div class="chart-container">
                     <div class="chart">
-                        <h3>🏛️ Decisions by Court</h3>"""
+                        <h3>🏛️ Decisions by Court</h3>"""]
         
         # Court statistics chart
         if court_stats:
             max_court_count = max(count for _, count in court_stats)
             for court, count in court_stats[:8]:  # Top 8 courts
                 percentage = (count / max_court_count) * 100
-                html_content += f"""
-                        <div class="bar">
-                            <div class="bar-label">{court[:30]}{'...' if len(court) > 30 else ''}</div>
-                            <div class="bar-fill" style="width: {percentage}%;">{count}</div>
-                        </div>"""
+                html_parts.append(STATS_BAR_TEMPLATE.format_map({
+                    'label': court[:30] + ('...' if len(court) > 30 else ''),
+                    'percentage': percentage,
+                    'count': count,
+                }))
         
-        html_content += """
+        html_parts.append("""
                     </div>
                     
                     <div class="chart">
-                        <h3>⚖️ Action Types</h3>"""
+                        <h3>⚖️ Action Types</h3>""")
         
         # Action type statistics chart
         if action_stats:
             max_action_count = max(count for _, count in action_stats)
             for action_type, count in action_stats[:8]:  # Top 8 action types
                 percentage = (count / max_action_count) * 100
-                html_content += f"""
-                        <div class="bar">
-                            <div class="bar-label">{action_type[:25]}{'...' if len(action_type) > 25 else ''}</div>
-                            <div class="bar-fill" style="width: {percentage}%;">{count}</div>
-                        </div>"""
+                html_parts.append(STATS_BAR_TEMPLATE.format_map({
+                    'label': action_type[:25] + ('...' if len(action_type) > 25 else ''),
+                    'percentage': percentage,
+                    'count': count,
+                }))
         
-        html_content += """
+        html_parts.append("""
                     </div>
                 </div>
             </div>
@@ -311,19 +356,18 @@ def generate_statistics(db_path="upc_decisions.db"):
                                 <th>Court</th>
                             </tr>
                         </thead>
-                        <tbody>"""
+                        <tbody>""")
         
-        for i, (decision_ref, citations, parties, court) in enumerate(top_cited, 1):
-            html_content += f"""
+        html_parts.append(''.join(f"""
                             <tr>
                                 <td>#{i}</td>
                                 <td style="font-family: monospace; font-weight: bold;">{decision_ref}</td>
                                 <td><span class="citation-badge">{citations}</span></td>
                                 <td>{parties[:50]}{'...' if len(parties) > 50 else ''}</td>
                                 <td>{court[:30]}{'...' if len(court) > 30 else ''}</td>
-                            </tr>"""
+                            </tr>""" for i, (decision_ref, citations, parties, court) in enumerate(top_cited, 1)))
         
-        html_content += """
+        html_parts.append("""
                         </tbody>
                     </table>
                 </div>
@@ -332,52 +376,41 @@ def generate_statistics(db_path="upc_decisions.db"):
             <div class="section">
                 <div class="chart-container">
                     <div class="chart">
-                        <h3>📅 Monthly Activity</h3>"""
+                        <h3>📅 Monthly Activity</h3>""")
         
         # Monthly statistics
         if monthly_stats:
             max_monthly = max(count for _, count in monthly_stats)
             for month, count in monthly_stats[:12]:
                 percentage = (count / max_monthly) * 100
-                html_content += f"""
-                        <div class="bar">
-                            <div class="bar-label">{month}</div>
-                            <div class="bar-fill" style="width: {percentage}%;">{count}</div>
-                        </div>"""
+                html_parts.append(STATS_BAR_TEMPLATE.format_map({
+                    'label': month,
+                    'percentage': percentage,
+                    'count': count,
+                }))
         
-        html_content += """
+        html_parts.append("""
                     </div>
                     
                     <div class="chart">
-                        <h3>🏢 Most Active Parties</h3>"""
+                        <h3>🏢 Most Active Parties</h3>""")
         
         # Most active parties
         if most_active_parties:
             max_party_count = max(count for _, count in most_active_parties)
             for party, count in most_active_parties[:10]:
                 percentage = (count / max_party_count) * 100
-                html_content += f"""
-                        <div class="bar">
-                            <div class="bar-label">{party[:25]}{'...' if len(party) > 25 else ''}</div>
-                            <div class="bar-fill" style="width: {percentage}%;">{count}</div>
-                        </div>"""
-        
-        html_content += """
-                    </div>
-                </div>
-            </div>
-        </div>
+                html_parts.append(STATS_BAR_TEMPLATE.format_map({
+                    'label': party[:25] + ('...' if len(party) > 25 else ''),
+                    'percentage': percentage,
+                    'count': count,
+                }))
         
-        <div style="text-align: center; padding: 20px; color: rgba(255,255,255,0.8);">
-            <p>📊 Comprehensive UPC decision analysis • 🔄 Updated daily</p>
-        </div>
-    </div>
-</body>
-</html>"""
+        html_parts.append(STATS_HTML_FOOT)
         
         # Write statistics HTML
-        with open('upc_statistics.html', 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        with open('upc_statistics.html', 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.writelines(html_parts)
         
         print("✅ Statistics generated successfully!")
         
@@ -402,8 +435,11 @@ def generate_statistics(db_path="upc_decisions.db"):
             'most_active_parties': dict(most_active_parties)
         }
         
-        with open('upc_stats.json', 'w', encoding='utf-8') as f:
-            json.dump(stats_data, f, indent=2, ensure_ascii=False)
+        if emit_json:
+            import orjson  # only needed for --emit-json
+            
+            with open('upc_stats.json', 'wb') as f:
+                f.write(orjson.dumps(stats_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
         
         return stats_data
         
@@ -414,7 +450,7 @@ def generate_statistics(db_path="upc_decisions.db"):
 def main():
     """Main function"""
     try:
-        generate_statistics()
+        generate_statistics(emit_json='--emit-json' in sys.argv)
         return 0
     except Exception as e:
         print(f"Statistics generation failed: {e}")
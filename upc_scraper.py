@@ -5,16 +5,23 @@ Scrapes UPC decisions and generates citation analysis for GitHub Pages
 """
 
 import sqlite3
+import hashlib
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import re
 import logging
 import os
+import sys
+import threading
 from datetime import datetime, date
+from html import escape
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
-import PyPDF2
+import pymupdf
 import io
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Tuple
 
 # Configure logging
@@ -28,31 +35,253 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Decision reference, e.g. UPC_CFI_123/2024 or CoA_45/2023
+DECISION_REF_RE = re.compile(r'(?:UPC_)?(?:CFI|CoA)_\d+/20\d{2}')
+
+# Node id in detail page links, e.g. /en/node/12345
+NODE_RE = re.compile(r'/node/(\d+)')
+
+# Obergrenze der Listenseiten beim Backfill (--bulk); der Lauf endet vorher an der ersten Seite ohne neue Entscheidungen
+BULK_MAX_PAGES = 1000
+
+REPORT_HTML_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>UPC Citation Tracker - Top 100</title>
+    <style>
+        body {
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+            margin: 0;
+            padding: 0;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            min-height: 100vh;
+        }
+        .container {
+            max-width: 1400px;
+            margin: 0 auto;
+            padding: 20px;
+        }
+        .card {
+            background: white;
+            border-radius: 15px;
+            box-shadow: 0 20px 40px rgba(0,0,0,0.1);
+            overflow: hidden;
+            margin-bottom: 20px;
+        }
+        .header {
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+            padding: 40px 30px;
+            text-align: center;
+        }
+        .header h1 {
+            margin: 0;
+            font-size: 3em;
+            font-weight: 700;
+            letter-spacing: -1px;
+        }
+        .header p {
+            margin: 15px 0 0 0;
+            opacity: 0.9;
+            font-size: 1.2em;
+        }
+        .stats {
+            display: flex;
+            justify-content: space-around;
+            padding: 30px;
+            background: #f8f9fa;
+            text-align: center;
+        }
+        .stat {
+            flex: 1;
+        }
+        .stat-number {
+            font-size: 2.5em;
+            font-weight: bold;
+            color: #667eea;
+            display: block;
+        }
+        .stat-label {
+            color: #666;
+            font-size: 0.9em;
+            text-transform: uppercase;
+            letter-spacing: 1px;
+        }
+        .updated {
+            text-align: center;
+            padding: 20px;
+            background: #e3f2fd;
+            color: #1565c0;
+            font-weight: 500;
+        }
+        table {
+            width: 100%;
+            border-collapse: collapse;
+        }
+        th {
+            background: #f8f9fa;
+            padding: 20px 15px;
+            text-align: left;
+            font-weight: 600;
+            color: #333;
+            border-bottom: 2px solid #e9ecef;
+            position: sticky;
+            top: 0;
+            z-index: 10;
+        }
+        td {
+            padding: 15px;
+            border-bottom: 1px solid #e9ecef;
+            vertical-align: top;
+        }
+        tr:hover {
+            background: #f8f9fa;
+            transform: scale(1.001);
+            transition: all 0.2s ease;
+        }
+        .rank {
+            font-weight: bold;
+            color: #667eea;
+            text-align: center;
+            width: 60px;
+            font-size: 1.1em;
+        }
+        .decision-ref {
+            color: #667eea;
+            text-decoration: none;
+            font-weight: 600;
+            font-family: 'Monaco', 'Menlo', monospace;
+            padding: 8px 12px;
+            background: #f0f4ff;
+            border-radius: 6px;
+            display: inline-block;
+            transition: all 0.2s ease;
+        }
+        .decision-ref:hover {
+            background: #667eea;
+            color: white;
+            transform: translateY(-2px);
+            box-shadow: 0 4px 12px rgba(102, 126, 234, 0.3);
+        }
+        .citations {
+            background: linear-gradient(135deg, #667eea, #764ba2);
+            color: white;
+            padding: 8px 12px;
+            border-radius: 20px;
+            display: inline-block;
+            font-size: 0.9em;
+            font-weight: bold;
+            text-align: center;
+            min-width: 30px;
+            box-shadow: 0 2px 8px rgba(102, 126, 234, 0.3);
+        }
+        .parties {
+            max-width: 300px;
+            line-height: 1.4;
+            color: #333;
+        }
+        .court, .action-type {
+            color: #666;
+            font-size: 0.9em;
+            line-height: 1.4;
+        }
+        .court {
+            font-weight: 500;
+        }
+        @media (max-width: 768px) {
+            .container { padding: 10px; }
+            .header h1 { font-size: 2em; }
+            .stats { flex-direction: column; gap: 20px; }
+            table { font-size: 0.9em; }
+            th, td { padding: 10px 8px; }
+            .parties { max-width: 200px; }
+        }
+    </style>
+</head>
+<body>"""
+
+REPORT_ROW_TEMPLATE = """
+                        <tr>
+                            <td class="rank">#{rank}</td>
+                            <td><a href="{details_url}" class="decision-ref" target="_blank" rel="noopener">{decision_ref}</a></td>
+                            <td><span class="citations">{citations}</span></td>
+                            <td class="parties" title="{parties}">{parties}</td>
+                            <td class="court">{court}</td>
+                            <td class="action-type">{action_type}</td>
+                        </tr>"""
+
+REPORT_HTML_FOOT = """
+                    </tbody>
+                </table>
+            </div>
+        </div>
+        
+        <div style="text-align: center; padding: 20px; color: rgba(255,255,255,0.8);">
+            <p>📊 Data automatically scraped from <a href="https://www.unified-patent-court.org" style="color: rgba(255,255,255,0.9);">unified-patent-court.org</a></p>
+            <p>🔄 Updates daily via GitHub Actions • 🚀 Powered by Python & SQLite</p>
+        </div>
+    </div>
+</body>
+</html>"""
+
 class UPCDecisionScraper:
-    def __init__(self, db_path: str = "upc_decisions.db", delay: float = 5.0):
+    def __init__(self, db_path: str = "upc_decisions.db", delay: float = 5.0,
+                 pdf_workers: int = 4, max_retries: int = 3):
         """
         Initialize the UPC Decision Scraper for GitHub Actions
         
         Args:
             db_path: Path to SQLite database file
             delay: Delay between requests in seconds (shorter for CI)
+            pdf_workers: Number of PDFs downloaded concurrently
+            max_retries: Download attempts per PDF before giving up
         """
+        if pdf_workers < 1 or max_retries < 1:
+            raise ValueError("pdf_workers and max_retries must be at least 1")
+        
         self.db_path = db_path
         self.delay = delay
+        self.pdf_workers = pdf_workers
+        self.max_retries = max_retries
+        # Ende des letzten PDF-Downloads je Worker-Thread
+        self._worker_state = threading.local()
         self.base_url = "https://www.unified-patent-court.org"
         self.decisions_url = "https://www.unified-patent-court.org/en/decisions-and-orders"
         self.session = requests.Session()
+        # Genug Verbindungen für parallele PDF-Downloads plus Vorabruf der nächsten Seite
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=pdf_workers + 1))
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
         
+        # Eine Verbindung für den gesamten Lauf (Page-Cache bleibt warm)
+        self.conn = self.get_connection()
         self.init_database()
     
+    def close(self):
+        """Close the database connection and leave the file in rollback-journal mode"""
+        # journal_mode ist in der Datei gespeichert; die veröffentlichte DB soll kein WAL-Modus sein
+        self.conn.execute("PRAGMA journal_mode = DELETE")
+        self.conn.close()
+    
+    def get_connection(self) -> sqlite3.Connection:
+        """Open a database connection tuned for bulk writes and large scans"""
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript('''
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            PRAGMA temp_store = MEMORY;
+            PRAGMA cache_size = -65536;
+            PRAGMA mmap_size = 268435456;
+        ''')
+        return conn
+    
     def init_database(self):
         """Initialize SQLite database with required tables"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.conn.cursor()
             
             # Create UPC_decisions table
             cursor.execute('''
@@ -73,6 +302,14 @@ class UPCDecisionScraper:
                 )
             ''')
             
+            # Hash der Tabellenzeilen je Listenseite, um unveränderte Seiten zu überspringen
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS page_cache (
+                    page INTEGER PRIMARY KEY,
+                    tbody_sha1 TEXT NOT NULL
+                )
+            ''')
+            
             # Create index for faster citation queries
             cursor.execute('''
                 CREATE INDEX IF NOT EXISTS idx_decision_reference 
@@ -84,8 +321,14 @@ class UPCDecisionScraper:
                 ON UPC_decisions(number)
             ''')
             
-            conn.commit()
-            conn.close()
+            # Index in der Sortierreihenfolge des Top-100-Reports
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_citations_date
+                ON UPC_decisions(number_citations DESC, date DESC)
+                WHERE decision_reference != '' AND decision_reference IS NOT NULL
+            ''')
+            
+            self.conn.commit()
             logger.info("Database initialized successfully")
             
         except Exception as e:
@@ -117,7 +360,7 @@ class UPCDecisionScraper:
             logger.info(f"Fetching page {page}")
             response = self.session.get(self.decisions_url, params=params, timeout=30)
             response.raise_for_status()
-            return BeautifulSoup(response.content, 'html.parser')
+            return BeautifulSoup(response.content, 'lxml')
             
         except Exception as e:
             logger.error(f"Failed to fetch page {page}: {e}")
@@ -130,13 +373,13 @@ class UPCDecisionScraper:
             if len(cells) < 5:  # Angepasst für tatsächliche Tabellenstruktur
                 return None
             
-            # Extrahiere Daten aus Tabellenzellen (angepasst an echte UPC-Website)
-            date_text = cells[0].get_text(strip=True)
+            # Extrahiere Daten aus Tabellenzellen (angepasst an echte UPC-Website), Text einmal pro Zelle
+            texts = [cell.get_text(strip=True) for cell in cells]
+            date_text = texts[0]
             
             # Registry/Order Number (kann in verschiedenen Zellen sein)
             number = ""
-            for i in range(1, min(3, len(cells))):
-                cell_text = cells[i].get_text(strip=True)
+            for cell_text in texts[1:3]:
                 if cell_text and not cell_text.lower() in ['n/a', '-', '']:
                     number = cell_text
                     break
@@ -145,29 +388,27 @@ class UPCDecisionScraper:
                 return None
             
             # Weitere Felder extrahieren
-            court = cells[2].get_text(strip=True) if len(cells) > 2 else "Unknown"
-            type_of_action = cells[3].get_text(strip=True) if len(cells) > 3 else "Unknown"
-            parties = cells[4].get_text(strip=True) if len(cells) > 4 else "Unknown"
+            court = texts[2]
+            type_of_action = texts[3]
+            parties = texts[4]
             
             # PDF URL und Node aus Links extrahieren
             pdf_url = None
             node = None
             
-            # Suche nach PDF-Links in allen Zellen
-            for cell in cells:
-                links = cell.find_all('a', href=True)
-                for link in links:
-                    href = link.get('href')
-                    if href:
-                        # PDF Link
-                        if href.lower().endswith('.pdf'):
-                            if not pdf_url or 'en' in href.lower():
-                                pdf_url = urljoin(self.base_url, href)
-                        
-                        # Node Link (Full Details)
-                        node_match = re.search(r'/node/(\d+)', href)
-                        if node_match:
-                            node = node_match.group(1)
+            # Suche nach PDF-Links in der ganzen Zeile (ein Durchlauf)
+            for link in row.find_all('a', href=True):
+                href = link.get('href')
+                if href:
+                    # PDF Link
+                    if href.lower().endswith('.pdf'):
+                        if not pdf_url or 'en' in href.lower():
+                            pdf_url = urljoin(self.base_url, href)
+                    
+                    # Node Link (Full Details)
+                    node_match = NODE_RE.search(href)
+                    if node_match:
+                        node = node_match.group(1)
             
             return {
                 'date': date_text,
@@ -183,41 +424,64 @@ class UPCDecisionScraper:
             logger.warning(f"Failed to parse decision row: {e}")
             return None
     
-    def extract_pdf_text(self, pdf_url: str) -> Tuple[str, str]:
+    def download_pdf(self, pdf_url: str) -> io.BytesIO:
+        """Download a PDF, retrying transient errors with exponential backoff (runs in worker threads)"""
+        for attempt in range(self.max_retries):
+            # Pause zwischen PDF-Downloads (pro Worker) vor der nächsten Anfrage, damit der
+            # fertige Puffer ohne Wartezeit an die Extraktion geht; Wiederholungen warten den Backoff ab
+            last_download = getattr(self._worker_state, 'last_download', None)
+            if attempt == 0 and last_download is not None:
+                time.sleep(max(0.0, last_download + self.delay - time.monotonic()))
+            
+            try:
+                logger.info(f"Downloading PDF: {pdf_url}")
+                pdf_buffer = io.BytesIO()
+                with self.session.get(pdf_url, stream=True, timeout=60) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size=65536):
+                        pdf_buffer.write(chunk)
+                pdf_buffer.seek(0)
+                return pdf_buffer
+                
+            except (requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError, requests.HTTPError) as e:
+                # Nur vorübergehende Fehler wiederholen; 404/403 usw. sofort weiterreichen
+                if isinstance(e, requests.HTTPError) and not self.is_transient_status(e.response):
+                    raise
+                if attempt == self.max_retries - 1:
+                    raise
+                backoff = self.delay * 2 ** attempt
+                logger.warning(f"PDF download failed ({e}), retrying in {backoff:.1f}s")
+                time.sleep(backoff)
+            
+            finally:
+                self._worker_state.last_download = time.monotonic()
+    
+    @staticmethod
+    def is_transient_status(response: Optional[requests.Response]) -> bool:
+        """Rate limiting (429) and server errors (5xx) are worth retrying"""
+        return response is not None and (response.status_code == 429 or response.status_code >= 500)
+    
+    def extract_pdf_text(self, pdf_url: str, pdf_content: io.BytesIO) -> Tuple[str, str]:
         """Extract text from PDF and find decision reference"""
         try:
             logger.info(f"Extracting PDF: {pdf_url}")
-            response = self.session.get(pdf_url, timeout=60)
-            response.raise_for_status()
-            
-            # Extract text using PyPDF2
-            pdf_file = io.BytesIO(response.content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
             
-            fulltext = ""
-            for page in pdf_reader.pages:
-                try:
-                    fulltext += page.extract_text() + "\n"
-                except Exception as e:
-                    logger.warning(f"Failed to extract text from PDF page: {e}")
-                    continue
+            # Extract text using PyMuPDF
+            doc = pymupdf.open(stream=pdf_content, filetype="pdf")
+            try:
+                fulltext = "\n".join(page.get_text("text") for page in doc)
+            finally:
+                doc.close()
+                pymupdf.TOOLS.store_shrink(100)  # MuPDF-Cache (Fonts, Bilder) freigeben
             
             # Extract decision reference using regex
             decision_reference = ""
-            decision_ref_patterns = [
-                r'UPC_CFI_\d+/20\d{2}',
-                r'UPC_CoA_\d+/20\d{2}',
-                r'CFI_\d+/20\d{2}',
-                r'CoA_\d+/20\d{2}'
-            ]
-            
-            for pattern in decision_ref_patterns:
-                matches = re.findall(pattern, fulltext)
-                if matches:
-                    decision_reference = matches[0]
-                    if not decision_reference.startswith('UPC_'):
-                        decision_reference = 'UPC_' + decision_reference
-                    break
+            match = DECISION_REF_RE.search(fulltext)
+            if match:
+                decision_reference = match.group(0)
+                if not decision_reference.startswith('UPC_'):
+                    decision_reference = 'UPC_' + decision_reference
             
             return fulltext, decision_reference
             
@@ -225,30 +489,30 @@ class UPCDecisionScraper:
             logger.error(f"Failed to extract PDF text from {pdf_url}: {e}")
             return "", ""
     
-    def decision_exists(self, number: str) -> bool:
-        """Check if decision already exists in database"""
+    def get_existing_numbers(self) -> set:
+        """Load the numbers of all decisions already in the database"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM UPC_decisions WHERE number = ?", (number,))
-            count = cursor.fetchone()[0]
-            conn.close()
-            return count > 0
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT number FROM UPC_decisions")
+            numbers = {number for (number,) in cursor}
+            return numbers
         except Exception as e:
-            logger.error(f"Failed to check if decision exists: {e}")
-            return False
+            logger.error(f"Failed to load existing decisions: {e}")
+            return set()
     
-    def save_decision(self, decision_data: Dict):
-        """Save decision to database"""
+    def save_decisions(self, decisions: List[Dict]):
+        """Save a batch of decisions to the database in a single transaction"""
+        if not decisions:
+            return
+        
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.conn.cursor()
             
-            cursor.execute('''
+            cursor.executemany('''
                 INSERT OR REPLACE INTO UPC_decisions 
                 (date, number, court, type_of_action, parties, pdf_url, node, fulltext, decision_reference, updated_at)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (
+            ''', [(
                 decision_data['date'],
                 decision_data['number'],
                 decision_data['court'],
@@ -258,75 +522,146 @@ class UPCDecisionScraper:
                 decision_data['node'],
                 decision_data.get('fulltext', ''),
                 decision_data.get('decision_reference', '')
-            ))
+            ) for decision_data in decisions])
             
-            conn.commit()
-            conn.close()
-            logger.info(f"Saved decision: {decision_data['number']}")
+            self.conn.commit()
+            logger.info(f"Saved {len(decisions)} decisions: {', '.join(d['number'] for d in decisions)}")
             
         except Exception as e:
-            logger.error(f"Failed to save decision: {e}")
+            self.conn.rollback()
+            logger.error(f"Failed to save decisions: {e}")
     
-    def scrape_decisions(self, max_pages: int = 10):
-        """Main scraping function - limited pages for CI environment"""
+    def drop_indexes(self):
+        """
+        Drop all explicitly created indexes on UPC_decisions before a bulk import
+        
+        init_database recreates the scraper's indexes afterwards; generate_stats.py
+        recreates its own on its next run. The UNIQUE autoindex on number (sql IS NULL)
+        is kept because INSERT OR REPLACE depends on it.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type = 'index' AND tbl_name = 'UPC_decisions' AND sql IS NOT NULL
+        """)
+        for (index_name,) in cursor.fetchall():
+            cursor.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+        self.conn.commit()
+    
+    def scrape_decisions(self, max_pages: int = 10, bulk: bool = False):
+        """
+        Main scraping function - limited pages for CI environment
+        
+        Args:
+            max_pages: Maximum number of listing pages to scrape
+            bulk: Initial import; build the indexes once after inserting
+                  instead of updating them row by row
+        """
         logger.info("Starting UPC decision scraping")
         new_decisions_count = 0
+        existing_numbers = self.get_existing_numbers()
+        page_hashes = dict(self.conn.execute("SELECT page, tbody_sha1 FROM page_cache"))
         
-        for page in range(max_pages):
-            try:
-                soup = self.get_decisions_page(page)
-                
-                # Finde die Entscheidungstabelle
-                table = soup.find('table', {'class': 'views-table'}) or soup.find('table')
-                if not table:
-                    logger.warning(f"No table found on page {page}")
-                    break
-                
-                tbody = table.find('tbody')
-                rows = tbody.find_all('tr') if tbody else table.find_all('tr')[1:]
-                
-                if not rows:
-                    logger.info(f"No decisions found on page {page}")
-                    break
-                
-                page_new_decisions = 0
-                
-                for row in rows:
-                    decision_data = self.parse_decision_row(row)
-                    if not decision_data or not decision_data['number']:
-                        continue
+        if bulk:
+            self.drop_indexes()
+        
+        with ThreadPoolExecutor(max_workers=self.pdf_workers) as executor:
+            if max_pages > 0:
+                next_page = executor.submit(self.get_decisions_page, 0)
+            for page in range(max_pages):
+                try:
+                    soup = next_page.result()
+                    
+                    # Finde die Entscheidungstabelle
+                    table = soup.find('table', {'class': 'views-table'}) or soup.find('table')
+                    if not table:
+                        logger.warning(f"No table found on page {page}")
+                        break
                     
-                    # Prüfe ob Entscheidung bereits existiert
-                    if self.decision_exists(decision_data['number']):
-                        logger.info(f"Decision {decision_data['number']} already exists")
-                        continue
+                    tbody = table.find('tbody')
+                    rows = tbody.find_all('tr') if tbody else table.find_all('tr')[1:]
                     
-                    # Extrahiere PDF-Text falls URL verfügbar
-                    if decision_data['pdf_url']:
+                    if not rows:
+                        logger.info(f"No decisions found on page {page}")
+                        break
+                    
+                    # Seite unverändert seit dem letzten Lauf: alle Entscheidungen sind bereits gespeichert
+                    page_hash = hashlib.sha1(str(tbody or table).encode()).hexdigest()
+                    if page_hashes.get(page) == page_hash:
+                        logger.info(f"Page {page} unchanged since last run")
+                        break
+                    
+                    page_decisions = []
+                    unparsed_rows = 0
+                    
+                    for row in rows:
+                        decision_data = self.parse_decision_row(row)
+                        if not decision_data or not decision_data['number']:
+                            unparsed_rows += 1
+                            continue
+                        
+                        # Prüfe ob Entscheidung bereits existiert
+                        if decision_data['number'] in existing_numbers:
+                            logger.info(f"Decision {decision_data['number']} already exists")
+                            continue
+                        
+                        existing_numbers.add(decision_data['number'])
+                        page_decisions.append(decision_data)
+                    
+                    # Nur wenn die Seite neue Entscheidungen hat, geht der Lauf weiter: dann die
+                    # nächste Seite nach der Pause schon laden, während diese verarbeitet wird
+                    if page_decisions and page + 1 < max_pages:
+                        time.sleep(self.delay)  # Pause zwischen Seiten
+                        next_page = executor.submit(self.get_decisions_page, page + 1)
+                    
+                    # PDFs parallel herunterladen, Text sequentiell extrahieren; höchstens
+                    # pdf_workers Downloads laufen der Extraktion voraus (begrenzt den Speicher)
+                    pdf_decisions = [d for d in page_decisions if d['pdf_url']]
+                    downloads = deque(
+                        executor.submit(self.download_pdf, decision_data['pdf_url'])
+                        for decision_data in pdf_decisions[:self.pdf_workers]
+                    )
+                    
+                    for i, decision_data in enumerate(pdf_decisions):
+                        download = downloads.popleft()
+                        if i + self.pdf_workers < len(pdf_decisions):
+                            downloads.append(executor.submit(self.download_pdf, pdf_decisions[i + self.pdf_workers]['pdf_url']))
+                        
                         try:
-                            fulltext, decision_reference = self.extract_pdf_text(decision_data['pdf_url'])
+                            fulltext, decision_reference = self.extract_pdf_text(decision_data['pdf_url'], download.result())
                             decision_data['fulltext'] = fulltext
                             decision_data['decision_reference'] = decision_reference
                         except Exception as e:
                             logger.warning(f"Failed to extract PDF for {decision_data['number']}: {e}")
                         
-                        time.sleep(self.delay)  # Pause zwischen PDF-Downloads
+                        del download  # PDF-Puffer sofort freigeben
                     
-                    self.save_decision(decision_data)
-                    new_decisions_count += 1
-                    page_new_decisions += 1
-                
-                logger.info(f"Page {page}: Found {page_new_decisions} new decisions")
-                
-                # Wenn keine neuen Entscheidungen auf dieser Seite, stoppe
-                if page_new_decisions == 0:
-                    break
+                    # Alle neuen Entscheidungen der Seite in einer Transaktion speichern
+                    self.save_decisions(page_decisions)
+                    page_new_decisions = len(page_decisions)
+                    new_decisions_count += page_new_decisions
+                    
+                    logger.info(f"Page {page}: Found {page_new_decisions} new decisions")
                     
-                time.sleep(self.delay)  # Pause zwischen Seiten
+                    # Wenn keine neuen Entscheidungen auf dieser Seite, stoppe; den Hash nur merken,
+                    # wenn jede Zeile geparst wurde und bereits gespeichert ist
+                    if page_new_decisions == 0:
+                        if unparsed_rows == 0:
+                            self.conn.execute(
+                                "INSERT OR REPLACE INTO page_cache (page, tbody_sha1) VALUES (?, ?)",
+                                (page, page_hash)
+                            )
+                            self.conn.commit()
+                        else:
+                            logger.warning(f"Page {page}: {unparsed_rows} rows could not be parsed, not caching page hash")
+                        break
                 
-            except Exception as e:
-                logger.error(f"Error scraping page {page}: {e}")
-                break
+                except Exception as e:
+                    logger.error(f"Error scraping page {page}: {e}")
+                    break
+        
+        if bulk:
+            self.init_database()
         
         logger.info(f"Finished scraping: {new_decisions_count} new decisions found")
     
@@ -335,38 +670,40 @@ class UPCDecisionScraper:
         logger.info("Calculating citation counts")
         
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.conn.cursor()
             
             cursor.execute("SELECT id, decision_reference FROM UPC_decisions WHERE decision_reference != '' AND decision_reference IS NOT NULL")
             decisions = cursor.fetchall()
             
+            ids_by_ref = {}
             for decision_id, decision_ref in decisions:
-                if not decision_ref:
-                    continue
-                
-                # Zähle Zitierungen in anderen Entscheidungen
-                cursor.execute("""
-                    SELECT COUNT(*) FROM UPC_decisions 
-                    WHERE id != ? AND fulltext LIKE ? AND fulltext IS NOT NULL
-                """, (decision_id, f"%{decision_ref}%"))
-                
-                citation_count = cursor.fetchone()[0]
-                
-                cursor.execute("""
-                    UPDATE UPC_decisions 
-                    SET number_citations = ?, updated_at = CURRENT_TIMESTAMP 
-                    WHERE id = ?
-                """, (citation_count, decision_id))
-                
-                if citation_count > 0:
-                    logger.info(f"Decision {decision_ref}: {citation_count} citations")
+                ids_by_ref.setdefault(decision_ref, []).append(decision_id)
+            citation_counts = dict.fromkeys((decision_id for decision_id, _ in decisions), 0)
+            
+            # Ein Durchlauf über alle Volltexte: gefundene Referenzen einmal pro zitierender Entscheidung zählen
+            cursor.execute("SELECT id, fulltext FROM UPC_decisions WHERE fulltext != '' AND fulltext IS NOT NULL")
+            for citing_id, fulltext in cursor:
+                cited_refs = {match.group(0) for match in DECISION_REF_RE.finditer(fulltext)}
+                for decision_ref in cited_refs.intersection(ids_by_ref):
+                    for decision_id in ids_by_ref[decision_ref]:
+                        if decision_id != citing_id:
+                            citation_counts[decision_id] += 1
+            
+            cursor.executemany("""
+                UPDATE UPC_decisions 
+                SET number_citations = ?, updated_at = CURRENT_TIMESTAMP 
+                WHERE id = ?
+            """, [(citation_count, decision_id) for decision_id, citation_count in citation_counts.items()])
+            
+            for decision_id, decision_ref in decisions:
+                if citation_counts[decision_id] > 0:
+                    logger.info(f"Decision {decision_ref}: {citation_counts[decision_id]} citations")
             
-            conn.commit()
-            conn.close()
+            self.conn.commit()
             logger.info("Finished calculating citations")
             
         except Exception as e:
+            self.conn.rollback()
             logger.error(f"Failed to calculate citations: {e}")
     
     def generate_html_report(self, output_file: str = "upc_top_100.html"):
@@ -374,8 +711,7 @@ class UPCDecisionScraper:
         logger.info("Generating HTML report")
         
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.conn.cursor()
             
             cursor.execute("""
                 SELECT decision_reference, number_citations, parties, court, type_of_action, node, date
@@ -397,166 +733,8 @@ class UPCDecisionScraper:
             cursor.execute("SELECT COUNT(*) FROM UPC_decisions WHERE number_citations > 0")
             cited_decisions = cursor.fetchone()[0]
             
-            conn.close()
-            
             # Generiere HTML
-            html_content = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>UPC Citation Tracker - Top 100</title>
-    <style>
-        body {{
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-            margin: 0;
-            padding: 0;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-        }}
-        .container {{
-            max-width: 1400px;
-            margin: 0 auto;
-            padding: 20px;
-        }}
-        .card {{
-            background: white;
-            border-radius: 15px;
-            box-shadow: 0 20px 40px rgba(0,0,0,0.1);
-            overflow: hidden;
-            margin-bottom: 20px;
-        }}
-        .header {{
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 40px 30px;
-            text-align: center;
-        }}
-        .header h1 {{
-            margin: 0;
-            font-size: 3em;
-            font-weight: 700;
-            letter-spacing: -1px;
-        }}
-        .header p {{
-            margin: 15px 0 0 0;
-            opacity: 0.9;
-            font-size: 1.2em;
-        }}
-        .stats {{
-            display: flex;
-            justify-content: space-around;
-            padding: 30px;
-            background: #f8f9fa;
-            text-align: center;
-        }}
-        .stat {{
-            flex: 1;
-        }}
-        .stat-number {{
-            font-size: 2.5em;
-            font-weight: bold;
-            color: #667eea;
-            display: block;
-        }}
-        .stat-label {{
-            color: #666;
-            font-size: 0.9em;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-        }}
-        .updated {{
-            text-align: center;
-            padding: 20px;
-            background: #e3f2fd;
-            color: #1565c0;
-            font-weight: 500;
-        }}
-        table {{
-            width: 100%;
-            border-collapse: collapse;
-        }}
-        th {{
-            background: #f8f9fa;
-            padding: 20px 15px;
-            text-align: left;
-            font-weight: 600;
-            color: #333;
-            border-bottom: 2px solid #e9ecef;
-            position: sticky;
-            top: 0;
-            z-index: 10;
-        }}
-        td {{
-            padding: 15px;
-            border-bottom: 1px solid #e9ecef;
-            vertical-align: top;
-        }}
-        tr:hover {{
-            background: #f8f9fa;
-            transform: scale(1.001);
-            transition: all 0.2s ease;
-        }}
-        .rank {{
-            font-weight: bold;
-            color: #667eea;
-            text-align: center;
-            width: 60px;
-            font-size: 1.1em;
-        }}
-        .decision-ref {{
-            color: #667eea;
-            text-decoration: none;
-            font-weight: 600;
-            font-family: 'Monaco', 'Menlo', monospace;
-            padding: 8px 12px;
-            background: #f0f4ff;
-            border-radius: 6px;
-            display: inline-block;
-            transition: all 0.2s ease;
-        }}
-        .decision-ref:hover {{
-            background: #667eea;
-            color: white;
-            transform: translateY(-2px);
-            box-shadow: 0 4px 12px rgba(102, 126, 234, 0.3);
-        }}
-        .citations {{
-            background: linear-gradient(135deg, #667eea, #764ba2);
-            color: white;
-            padding: 8px 12px;
-            border-radius: 20px;
-            display: inline-block;
-            font-size: 0.9em;
-            font-weight: bold;
-            text-align: center;
-            min-width: 30px;
-            box-shadow: 0 2px 8px rgba(102, 126, 234, 0.3);
-        }}
-        .parties {{
-            max-width: 300px;
-            line-height: 1.4;
-            color: #333;
-        }}
-        .court, .action-type {{
-            color: #666;
-            font-size: 0.9em;
-            line-height: 1.4;
-        }}
-        .court {{
-            font-weight: 500;
-        }}
-        @media (max-width: 768px) {{
-            .container {{ padding: 10px; }}
-            .header h1 {{ font-size: 2em; }}
-            .stats {{ flex-direction: column; gap: 20px; }}
-            table {{ font-size: 0.9em; }}
-            th, td {{ padding: 10px 8px; }}
-            .parties {{ max-width: 200px; }}
-        }}
-    </style>
-</head>
-<body>
+            html_parts = [REPORT_HTML_HEAD, f"""
     <div class="container">
         <div class="card">
             <div class="header">
@@ -595,37 +773,25 @@ class UPCDecisionScraper:
                             <th>Type of Action</th>
                         </tr>
                     </thead>
-                    <tbody>"""
+                    <tbody>"""]
             
             for i, (decision_ref, citations, parties, court, action_type, node, date) in enumerate(decisions, 1):
                 details_url = f"https://www.unified-patent-court.org/en/node/{node}" if node else "#"
                 
-                html_content += f"""
-                        <tr>
-                            <td class="rank">#{i}</td>
-                            <td><a href="{details_url}" class="decision-ref" target="_blank" rel="noopener">{decision_ref or 'N/A'}</a></td>
-                            <td><span class="citations">{citations}</span></td>
-                            <td class="parties" title="{parties}">{parties}</td>
-                            <td class="court">{court}</td>
-                            <td class="action-type">{action_type}</td>
-                        </tr>"""
-            
-            html_content += """
-                    </tbody>
-                </table>
-            </div>
-        </div>
-        
-        <div style="text-align: center; padding: 20px; color: rgba(255,255,255,0.8);">
-            <p>📊 Data automatically scraped from <a href="https://www.unified-patent-court.org" style="color: rgba(255,255,255,0.9);">unified-patent-court.org</a></p>
-            <p>🔄 Updates daily via GitHub Actions • 🚀 Powered by Python & SQLite</p>
-        </div>
-    </div>
-</body>
-</html>"""
+                html_parts.append(REPORT_ROW_TEMPLATE.format_map({
+                    'rank': i,
+                    'details_url': details_url,
+                    'decision_ref': escape(decision_ref or 'N/A'),
+                    'citations': citations,
+                    'parties': escape(parties or ''),
+                    'court': escape(court or ''),
+                    'action_type': escape(action_type or ''),
+                }))
+            
+            html_parts.append(REPORT_HTML_FOOT)
             
             with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+                f.writelines(html_parts)
             
             logger.info(f"HTML report generated: {output_file}")
             
@@ -633,13 +799,19 @@ class UPCDecisionScraper:
             logger.error(f"Failed to generate HTML report: {e}")
             raise
     
-    def run_daily_update(self):
-        """Main function for GitHub Actions"""
+    def run_daily_update(self, bulk: bool = False):
+        """
+        Main function for GitHub Actions
+        
+        Args:
+            bulk: Initial backfill - scrape until the first page without new
+                  decisions (no CI page limit) and build the indexes afterwards
+        """
         logger.info("=== Starting UPC GitHub Actions Update ===")
         
         try:
-            # Scrape mit Limit für CI-Umgebung
-            self.scrape_decisions(max_pages=5)
+            # Scrape mit Limit für CI-Umgebung (Backfill: bis keine neuen Entscheidungen mehr kommen)
+            self.scrape_decisions(max_pages=BULK_MAX_PAGES if bulk else 5, bulk=bulk)
             
             # Berechne Zitierungen
             self.calculate_citations()
@@ -655,10 +827,13 @@ class UPCDecisionScraper:
 
 
 def main():
-    """Main function for GitHub Actions"""
+    """Main function for GitHub Actions (pass --bulk for the initial backfill)"""
     try:
         scraper = UPCDecisionScraper(delay=3.0)  # Kürzere Delays für CI
-        scraper.run_daily_update()
+        try:
+            scraper.run_daily_update(bulk='--bulk' in sys.argv)
+        finally:
+            scraper.close()  # WAL zurückschreiben, bevor upc_decisions.db veröffentlicht wird
         print("✅ UPC scraping completed successfully!")
         
     except Exception as e: